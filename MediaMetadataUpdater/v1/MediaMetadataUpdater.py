@@ -1,374 +1,493 @@
-import os
-import re
-import shutil
-import subprocess
-import argparse
-import math
-from datetime import datetime
-from concurrent.futures import ProcessPoolExecutor, as_completed
-
-# Default folders (can overridden by --directory)
-folders = r"/data"
-
-# REGEX PATTERNS
-
-# ISO pattern 1: username=_=timestamp
-pattern_iso_eq = re.compile(
-    r'^(.*)=_=(\d{4}-\d{2}-\d{2}T\d{6}(?:\.\d{3})?Z)(?:[_A-Za-z0-9\+\-]+)?(?:\s*\(\d+\))?\.(.+)$'
-)
-
-# ISO pattern 2: username__timestamp
-pattern_iso_us = re.compile(
-    r'^(.*)__(\d{4}-\d{2}-\d{2}T\d{6}(?:\.\d{3})?Z)(?:[_A-Za-z0-9\+\-]+)?(?:\s*\(\d+\))?\.(.+)$'
-)
-
-# ALT pattern
-pattern_alt = re.compile(
-    r'^(\d{4}-\d{2}-\d{2} \d{2}\.\d{2}\.\d{2}).*'
-)
-
-# Fallback pattern 1: YYMMDD<space>anything
-pattern_fb_space = re.compile(
-    r'^(\d{2})(\d{2})(\d{2})\s+.*'
-)
-
-# Fallback pattern 2: YYMMDD-anything
-pattern_fb_dash = re.compile(
-    r'^(\d{2})(\d{2})(\d{2})-.*'
-)
-
-# LOG FILES
-
-cwd = os.getcwd()
-match_log = os.path.join(cwd, "0Match.log")
-notmatch_log = os.path.join(cwd, "0NotMatch.log")
-changed_log = os.path.join(cwd, "0FileChanged.log")
-
-summary = {
-    "total": 0,
-    "match": 0,
-    "notmatch": 0,
-    "skipped": 0,
-    "increased": 0,
-    "decreased": 0
-}
-
-# ARGUMENT PARSER
-
-def parse_args():
-    parser = argparse.ArgumentParser(description="Media Metadata Updater")
-
-    parser.add_argument(
-        "--workers",
-        default="80",
-        help="Percentage of CPU threads to use (e.g., 50, 80, 100) or 'all'"
-    )
-
-    parser.add_argument(
-        "--verbose",
-        action="store_true",
-        help="Print detailed logs for each file instead of a progress bar"
-    )
-
-    parser.add_argument(
-        "--directory",
-        help="Comma-separated list of directories to scan (overrides default folders)"
-    )
-
-    return parser.parse_args()
-
-# PROGRESS BAR
-
-def print_progress(current, total, bar_length=40):
-    if total == 0:
-        return
-    percent = current / total
-    filled = int(bar_length * percent)
-    bar = "█" * filled + "░" * (bar_length - filled)
-    print(f"\rProcessing files: |{bar}| {current}/{total} ({percent*100:.1f}%)", end="", flush=True)
-
-# MOVE HELPERS (cross-drive safe)
-
-def safe_move(src, dst_dir):
-    os.makedirs(dst_dir, exist_ok=True)
-    target = os.path.join(dst_dir, os.path.basename(src))
-    shutil.copy2(src, target)
-    os.remove(src)
-    return target
-
-def move_to_riff(fpath):
-    return safe_move(fpath, os.path.join(cwd, "riff"))
-
-def move_to_failed(fpath):
-    return safe_move(fpath, os.path.join(cwd, "failed"))
-
-def move_to_manual(fpath):
-    folder = os.path.dirname(fpath)
-    manual_dir = os.path.join(folder, "manual")
-    os.makedirs(manual_dir, exist_ok=True)
-
-    base = os.path.basename(fpath)
-    target = os.path.join(manual_dir, base)
-
-    if os.path.exists(target):
-        name, ext = os.path.splitext(base)
-        counter = 1
-        while True:
-            new_name = f"{name} ({counter}){ext}"
-            new_target = os.path.join(manual_dir, new_name)
-            if not os.path.exists(new_target):
-                target = new_target
-                break
-            counter += 1
-
-    shutil.copy2(fpath, target)
-    os.remove(fpath)
-    return target
-
-# PROCESS FILE
-
-def process_file(fpath):
-    fname = os.path.basename(fpath)
-    if not os.path.isfile(fpath):
-        return (fname, None, "skip", None)
-
-    try:
-        size_before = os.path.getsize(fpath)
-    except OSError:
-        return (fname, None, "error_size_before", None)
-
-    timestamp_str = None
-    dt = None
-
-    # ISO PATTERN 1 (=_=)
-    m_iso1 = pattern_iso_eq.match(fname)
-    if m_iso1:
-        timestamp_str = m_iso1.group(2)
-        try:
-            dt = datetime.strptime(timestamp_str, "%Y-%m-%dT%H%M%S.%fZ")
-        except ValueError:
-            try:
-                dt = datetime.strptime(timestamp_str, "%Y-%m-%dT%H%M%SZ")
-            except ValueError:
-                moved = move_to_failed(fpath)
-                return (fname, f"ISO1 timestamp parse error → moved to {moved}", "notmatch", (size_before, size_before))
-
-    else:
-        # ISO PATTERN 2 (__)
-        m_iso2 = pattern_iso_us.match(fname)
-        if m_iso2:
-            timestamp_str = m_iso2.group(2)
-            try:
-                dt = datetime.strptime(timestamp_str, "%Y-%m-%dT%H%M%S.%fZ")
-            except ValueError:
-                try:
-                    dt = datetime.strptime(timestamp_str, "%Y-%m-%dT%H%M%SZ")
-                except ValueError:
-                    moved = move_to_failed(fpath)
-                    return (fname, f"ISO2 timestamp parse error → moved to {moved}", "notmatch", (size_before, size_before))
-
-        else:
-            # ALT PATTERN
-            m_alt = pattern_alt.match(fname)
-            if m_alt:
-                timestamp_str = m_alt.group(1)
-                try:
-                    dt = datetime.strptime(timestamp_str, "%Y-%m-%d %H.%M.%S")
-                except ValueError:
-                    moved = move_to_failed(fpath)
-                    return (fname, f"ALT timestamp parse error → moved to {moved}", "notmatch", (size_before, size_before))
-
-            else:
-                # FALLBACK PATTERN 1 (YYMMDD<space>)
-                m_fb1 = pattern_fb_space.match(fname)
-                if m_fb1:
-                    yy, mm, dd = m_fb1.groups()
-                    year = int("20" + yy)
-                    month = int(mm)
-                    day = int(dd)
-                    try:
-                        dt = datetime(year, month, day, 0, 0, 0)
-                        timestamp_str = f"{year}-{mm}-{dd}"
-                    except ValueError:
-                        moved = move_to_failed(fpath)
-                        return (fname, f"Fallback1 YYMMDD parse error → moved to {moved}", "notmatch", (size_before, size_before))
-
-                else:
-                    # FALLBACK PATTERN 2 (YYMMDD-)
-                    m_fb2 = pattern_fb_dash.match(fname)
-                    if m_fb2:
-                        yy, mm, dd = m_fb2.groups()
-                        year = int("20" + yy)
-                        month = int(mm)
-                        day = int(dd)
-                        try:
-                            dt = datetime(year, month, day, 0, 0, 0)
-                            timestamp_str = f"{year}-{mm}-{dd}"
-                        except ValueError:
-                            moved = move_to_failed(fpath)
-                            return (fname, f"Fallback2 YYMMDD parse error → moved to {moved}", "notmatch", (size_before, size_before))
-
-                    else:
-                        moved = move_to_failed(fpath)
-                        return (fname, f"No pattern matched → moved to {moved}", "notmatch", (size_before, size_before))
-
-    # WRITE EXIF TIMESTAMP
-    exif_timestamp = dt.strftime("%Y:%m:%d %H:%M:%S")
-
-    # result = subprocess.run([
-        # os.path.join(cwd, "exiftool"),
-        # "-overwrite_original",
-        # f"-DateTimeOriginal={exif_timestamp}",
-        # fpath
-    # ], capture_output=True, text=True)
-
-    result = subprocess.run([
-        os.path.join(cwd, "exiftool"),
-        "-overwrite_original",
-        f"-DateTimeOriginal={exif_timestamp}",
-        f"-AllDates={exif_timestamp}",
-        f"-CreationTime={exif_timestamp}",
-        f"-ModifyDate={exif_timestamp}",
-        fpath
-    ], capture_output=True, text=True)
-
-    try:
-        size_after = os.path.getsize(fpath)
-    except OSError:
-        size_after = size_before
-
-    # SUCCESS
-    if result.returncode == 0:
-        return (fname, timestamp_str, "match", (size_before, size_after))
-
-    # FAILURE
-    err = result.stderr.strip()
-
-    if "Not a valid JPG (looks more like a RIFF)" in err:
-        moved = move_to_riff(fpath)
-        return (fname, f"RIFF detected → moved to {moved}", "notmatch", (size_before, size_after))
-
-    moved = move_to_failed(fpath)
-    return (fname, f"Exiftool error: {err} → moved to {moved}", "notmatch", (size_before, size_after))
-
-
-# MAIN FUNCTION
-
-def main():
-    args = parse_args()
-    verbose = args.verbose
-
-    # Determine worker count based on --workers
-    total_threads = os.cpu_count() or 1
-
-    if args.workers.lower() == "all":
-        workers = total_threads
-    else:
-        try:
-            pct = int(args.workers)
-            pct = max(1, min(pct, 100))
-            workers = max(1, math.floor(total_threads * (pct / 100)))
-        except ValueError:
-            workers = max(1, math.floor(total_threads * 0.8))
-
-    print(f"Using {workers} worker processes out of {total_threads} available threads.")
-
-    # Determine directories
-    if args.directory:
-        folder_list = [os.path.abspath(p.strip()) for p in args.directory.split(",") if p.strip()]
-        if verbose:
-            print(f"Using directories from --directory: {folder_list}")
-    else:
-        folder_list = [f.strip() for f in folders.split(",") if f.strip()]
-        if verbose:
-            print(f"Using default directories: {folder_list}")
-
-    all_files = []
-
-    # Scan directories
-    for folder in folder_list:
-        if os.path.isdir(folder):
-            for entry in os.listdir(folder):
-                fpath = os.path.join(folder, entry)
-                if os.path.isdir(fpath):
-                    with open(notmatch_log, "a", encoding="utf-8") as f_notmatch:
-                        f_notmatch.write(f"{entry} --> skipped directory\n")
-                    if verbose:
-                        print(f"Skipped directory: {entry}")
-                    summary["skipped"] += 1
-                else:
-                    all_files.append(fpath)
-
-    summary["total"] = len(all_files)
-
-    completed = 0
-    total = len(all_files)
-
-    with open(match_log, "w", encoding="utf-8") as f_match, \
-         open(notmatch_log, "w", encoding="utf-8") as f_notmatch, \
-         open(changed_log, "w", encoding="utf-8") as f_changed, \
-         ProcessPoolExecutor(max_workers=workers) as executor:
-
-        futures = {executor.submit(process_file, fpath): fpath for fpath in all_files}
-
-        for future in as_completed(futures):
-            fname, timestamp, status, sizes = future.result()
-            completed += 1
-
-            if verbose:
-                print(f"\n--- Checking file: {fname} ---")
-            else:
-                print_progress(completed, total)
-
-            if status == "match":
-                f_match.write(f"{fname} --> {timestamp}\n")
-                if verbose:
-                    print(f"Matched timestamp: {timestamp}")
-                summary["match"] += 1
-
-            elif status == "notmatch":
-                f_notmatch.write(f"{fname} --> {timestamp}\n")
-                if verbose:
-                    print(timestamp)
-                summary["notmatch"] += 1
-
-            elif status == "skip":
-                if verbose:
-                    print("Skipped (not a file).")
-                summary["skipped"] += 1
-
-            else:
-                f_notmatch.write(f"{fname} --> Unknown error\n")
-                if verbose:
-                    print("Other error, logged as not match.")
-                summary["notmatch"] += 1
-
-            if sizes:
-                size_before, size_after = sizes
-                if size_after > size_before:
-                    f_changed.write(f"{fname} --> size increased ({size_before} → {size_after} bytes)\n")
-                    if verbose:
-                        print(f"File size increased ({size_before} → {size_after} bytes).")
-                    summary["increased"] += 1
-                elif size_after < size_before:
-                    f_changed.write(f"{fname} --> size decreased ({size_before} → {size_after} bytes)\n")
-                    if verbose:
-                        print(f"File size decreased ({size_before} → {size_after} bytes).")
-                    summary["decreased"] += 1
-
-            if verbose:
-                print(f"[{completed}/{total}] Finished processing: {fname}")
-
-    if not verbose and total > 0:
-        print()
-
-    print("\n=== Summary ===")
-    print(f"Total files scanned: {summary['total']}")
-    print(f"Matched: {summary['match']}")
-    print(f"Not matched: {summary['notmatch']}")
-    print(f"Skipped: {summary['skipped']}")
-    print(f"Size increased: {summary['increased']}")
-    print(f"Size decreased: {summary['decreased']}")
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import errno
+import os
+import re
+import shutil
+import subprocess
+import argparse
+import math
+import tempfile
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# Default folders (can overridden by --directory)
+folders = r"/data"
+
+# REGEX PATTERNS
+
+# ISO patterns (username=_=timestamp / username__timestamp) start with
+# a greedy .* that defeats the regex engine's literal optimizer, so the
+# separator is located with str.rfind (a C memchr scan) and only the
+# fixed-width timestamp is regex-validated, anchored at that position.
+pattern_iso_ts = re.compile(
+    r'(\d{4}-\d{2}-\d{2}T\d{6}(?:\.\d{3})?Z)(?:[_A-Za-z0-9\+\-]+)?(?:\s*\(\d+\))?\.(?:.+)$'
+)
+
+def find_iso_ts(fname, sep):
+    """Locate sep from the right and validate the timestamp after it,
+    stepping left through earlier occurrences like the old greedy .*."""
+    idx = fname.rfind(sep)
+    while idx >= 0:
+        m = pattern_iso_ts.match(fname, idx + len(sep))
+        if m:
+            return m.group(1)
+        idx = fname.rfind(sep, 0, idx)
+    return None
+
+# Remaining shapes fused into one alternation, scanned once per file:
+#   ALT pattern:   YYYY-MM-DD HH.MM.SS
+#   Fallback:      YYMMDD<space or -> anything
+pattern_alt_fb = re.compile(
+    r'^(?:'
+    r'(?P<alt_ts>\d{4}-\d{2}-\d{2} \d{2}\.\d{2}\.\d{2}).*'
+    r'|(?P<fb_y>\d{2})(?P<fb_m>\d{2})(?P<fb_d>\d{2})(?P<fb_sep>[\s-]).*'
+    r')$'
+)
+
+# LOG FILES
+
+cwd = os.getcwd()
+match_log = os.path.join(cwd, "0Match.log")
+notmatch_log = os.path.join(cwd, "0NotMatch.log")
+changed_log = os.path.join(cwd, "0FileChanged.log")
+
+summary = {
+    "total": 0,
+    "match": 0,
+    "notmatch": 0,
+    "skipped": 0,
+    "increased": 0,
+    "decreased": 0
+}
+
+# ARGUMENT PARSER
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Media Metadata Updater")
+
+    parser.add_argument(
+        "--workers",
+        default="80",
+        help="Percentage of CPU threads to use (e.g., 50, 80, 100) or 'all'"
+    )
+
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print detailed logs for each file instead of a progress bar"
+    )
+
+    parser.add_argument(
+        "--directory",
+        help="Comma-separated list of directories to scan (overrides default folders)"
+    )
+
+    return parser.parse_args()
+
+# PROGRESS BAR
+
+# All 41 bar states are precomputed and printing is throttled, so a
+# large run doesn't allocate two strings and flush the TTY per file
+_BARS = ["█" * i + "░" * (40 - i) for i in range(41)]
+_last_print = 0.0
+
+def print_progress(current, total):
+    global _last_print
+    if total == 0:
+        return
+    now = time.monotonic()
+    if current != total and now - _last_print < 0.1:
+        return
+    _last_print = now
+    percent = current / total
+    bar = _BARS[int(40 * percent)]
+    print(f"\rProcessing files: |{bar}| {current}/{total} ({percent*100:.1f}%)", end="", flush=True)
+
+# MOVE HELPERS (cross-drive safe)
+
+def _copy_file(src, target):
+    """Cross-device copy: in-kernel copy_file_range when available,
+    shutil.copy2 otherwise; metadata is preserved either way."""
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(target, "wb") as fdst:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30):
+                    pass
+            shutil.copystat(src, target)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, target)
+
+def _rename_or_copy(src, target):
+    """Same-filesystem moves are a metadata-only rename; only a
+    cross-device move (EXDEV) pays for a byte copy."""
+    try:
+        os.replace(src, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        _copy_file(src, target)
+        os.remove(src)
+
+# Move-target dirs are known up front; main() creates riff/failed once
+# and _made_dirs keeps every later call from re-stating the directory
+riff_dir = os.path.join(cwd, "riff")
+failed_dir = os.path.join(cwd, "failed")
+_made_dirs = set()
+
+def _ensure_dir(path):
+    if path not in _made_dirs:
+        os.makedirs(path, exist_ok=True)
+        _made_dirs.add(path)
+
+def safe_move(src, dst_dir):
+    _ensure_dir(dst_dir)
+    target = os.path.join(dst_dir, os.path.basename(src))
+    _rename_or_copy(src, target)
+    return target
+
+def move_to_riff(fpath):
+    return safe_move(fpath, riff_dir)
+
+def move_to_failed(fpath):
+    return safe_move(fpath, failed_dir)
+
+def move_to_manual(fpath):
+    folder = os.path.dirname(fpath)
+    manual_dir = os.path.join(folder, "manual")
+    _ensure_dir(manual_dir)
+
+    base = os.path.basename(fpath)
+    target = os.path.join(manual_dir, base)
+
+    if os.path.exists(target):
+        name, ext = os.path.splitext(base)
+        counter = 1
+        while True:
+            new_name = f"{name} ({counter}){ext}"
+            new_target = os.path.join(manual_dir, new_name)
+            if not os.path.exists(new_target):
+                target = new_target
+                break
+            counter += 1
+
+    _rename_or_copy(fpath, target)
+    return target
+
+# PARSE FILE (pure CPU, runs in the pool)
+
+def parse_file(item):
+    fpath, size_before = item
+    fname = os.path.basename(fpath)
+    if size_before is None:
+        return (fname, None, "error_size_before", None)
+
+    # ISO separators first (literal find), then the fused ALT/FB regex
+    label = "ISO1"
+    timestamp_str = find_iso_ts(fname, "=_=")
+    if timestamp_str is None:
+        label = "ISO2"
+        timestamp_str = find_iso_ts(fname, "__")
+
+    m = None
+    if timestamp_str is None:
+        m = pattern_alt_fb.match(fname)
+        if not m:
+            moved = move_to_failed(fpath)
+            return (fname, f"No pattern matched → moved to {moved}", "notmatch", (size_before, size_before))
+
+    if timestamp_str:
+        # ISO PATTERN 1 (=_=) / ISO PATTERN 2 (__)
+        # Fixed layout YYYY-MM-DDTHHMMSS[.fff]Z: slice digits instead of strptime
+        ts = timestamp_str
+        try:
+            dt = datetime(
+                int(ts[0:4]), int(ts[5:7]), int(ts[8:10]),
+                int(ts[11:13]), int(ts[13:15]), int(ts[15:17])
+            )
+        except ValueError:
+            moved = move_to_failed(fpath)
+            return (fname, f"{label} timestamp parse error → moved to {moved}", "notmatch", (size_before, size_before))
+
+    elif m.group("alt_ts"):
+        # ALT PATTERN (YYYY-MM-DD HH.MM.SS, also fixed-width)
+        timestamp_str = m.group("alt_ts")
+        ts = timestamp_str
+        try:
+            dt = datetime(
+                int(ts[0:4]), int(ts[5:7]), int(ts[8:10]),
+                int(ts[11:13]), int(ts[14:16]), int(ts[17:19])
+            )
+        except ValueError:
+            moved = move_to_failed(fpath)
+            return (fname, f"ALT timestamp parse error → moved to {moved}", "notmatch", (size_before, size_before))
+
+    else:
+        # FALLBACK PATTERN (YYMMDD<space> or YYMMDD-)
+        yy, mm, dd = m.group("fb_y"), m.group("fb_m"), m.group("fb_d")
+        label = "Fallback2" if m.group("fb_sep") == "-" else "Fallback1"
+        year = int("20" + yy)
+        try:
+            dt = datetime(year, int(mm), int(dd), 0, 0, 0)
+            timestamp_str = f"{year}-{mm}-{dd}"
+        except ValueError:
+            moved = move_to_failed(fpath)
+            return (fname, f"{label} YYMMDD parse error → moved to {moved}", "notmatch", (size_before, size_before))
+
+    # Hand the EXIF write off to the batched exiftool phase
+    exif_timestamp = f"{dt.year:04d}:{dt.month:02d}:{dt.day:02d} {dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}"
+    return (fname, timestamp_str, "parsed", (fpath, exif_timestamp, size_before))
+
+def parse_files_chunk(paths):
+    """Parse a whole slice of files in one worker dispatch."""
+    return [parse_file(p) for p in paths]
+
+# BATCHED EXIF WRITE (one exiftool run via -@ argfile)
+
+exiftool_path = os.path.join(cwd, "exiftool")
+
+# Per-file argfile block; only the timestamp and path vary, so one
+# format call replaces six f-strings per entry
+ARGFILE_ENTRY = (
+    "-if\n"
+    # defined guard: a bare eq test raises a minor error on untagged
+    # files and exiftool then skips them, so fresh files never get written
+    'not (defined $DateTimeOriginal and $DateTimeOriginal eq "{ts}")\n'
+    "-overwrite_original\n"
+    "-DateTimeOriginal={ts}\n"
+    "-AllDates={ts}\n"
+    "-CreationTime={ts}\n"
+    "-ModifyDate={ts}\n"
+    "{path}\n"
+    # -echo4 prints its text after the block is processed, so each
+    # block ends with an unambiguous {{ready}} line no matter which
+    # summary variant ("updated" / "failed condition" / "weren't
+    # updated due to errors") exiftool emits for it
+    "-echo4\n"
+    "{{ready}}\n"
+    "-execute\n"
+)
+
+def run_exiftool_batch(entries):
+    """Write one argfile covering every matched file, run exiftool once,
+    and map each -execute block of the output back to its file."""
+    results = []
+    if not entries:
+        return results
+
+    with tempfile.NamedTemporaryFile("w", suffix=".args", delete=False, encoding="utf-8") as f:
+        argfile = f.name
+        for fname, timestamp_str, fpath, exif_timestamp, size_before in entries:
+            # The -if line skips the rewrite entirely when the tag is
+            # already correct: on re-runs N writes become N checks
+            f.write(ARGFILE_ENTRY.format(ts=exif_timestamp, path=fpath))
+
+    try:
+        # No text=True: keep the pipe in bytes and decode the whole
+        # capture once instead of paying per-read incremental decoding
+        result = subprocess.run(
+            [exiftool_path, "-@", argfile],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            # close_fds=False lets CPython launch via posix_spawn
+            # instead of fork, skipping the page-table copy
+            close_fds=False
+        )
+    finally:
+        os.remove(argfile)
+
+    output = result.stdout.decode("utf-8", "replace")
+
+    # The -echo4 {ready} sentinel closes each block (same marker the
+    # stay-open protocol uses), so splitting doesn't depend on which
+    # summary lines exiftool printed for the entry
+    blocks = []
+    current = []
+    for line in output.splitlines():
+        if line.strip() == "{ready}":
+            blocks.append("\n".join(current))
+            current = []
+        else:
+            current.append(line)
+
+    for i, (fname, timestamp_str, fpath, exif_timestamp, size_before) in enumerate(entries):
+        block = blocks[i] if i < len(blocks) else ""
+
+        # Only re-stat files exiftool actually rewrote
+        size_after = size_before
+
+        if "1 image files updated" in block:
+            try:
+                size_after = os.stat(fpath, follow_symlinks=False).st_size
+            except OSError:
+                pass
+            results.append((fname, timestamp_str, "match", (size_before, size_after)))
+        elif "files failed condition" in block:
+            # DateTimeOriginal already correct; nothing was rewritten
+            results.append((fname, timestamp_str, "match", (size_before, size_before)))
+        elif "Not a valid JPG (looks more like a RIFF)" in block:
+            moved = move_to_riff(fpath)
+            results.append((fname, f"RIFF detected → moved to {moved}", "notmatch", (size_before, size_after)))
+        else:
+            moved = move_to_failed(fpath)
+            results.append((fname, f"Exiftool error: {block.strip()} → moved to {moved}", "notmatch", (size_before, size_after)))
+
+    return results
+
+# MAIN FUNCTION
+
+def main():
+    args = parse_args()
+    verbose = args.verbose
+
+    # Determine worker count based on --workers
+    total_threads = os.cpu_count() or 1
+
+    if args.workers.lower() == "all":
+        workers = total_threads
+    else:
+        try:
+            pct = int(args.workers)
+            pct = max(1, min(pct, 100))
+            workers = max(1, math.floor(total_threads * (pct / 100)))
+        except ValueError:
+            workers = max(1, math.floor(total_threads * 0.8))
+
+    print(f"Using {workers} worker processes out of {total_threads} available threads.")
+
+    # Determine directories
+    if args.directory:
+        folder_list = [os.path.abspath(p.strip()) for p in args.directory.split(",") if p.strip()]
+        if verbose:
+            print(f"Using directories from --directory: {folder_list}")
+    else:
+        folder_list = [f.strip() for f in folders.split(",") if f.strip()]
+        if verbose:
+            print(f"Using default directories: {folder_list}")
+
+    all_files = []
+    skipped_dirs = []
+
+    # Scan directories. Skipped-directory names are collected here and
+    # written once the log is open — the old per-directory append was
+    # truncated away when the log was reopened in "w" mode below.
+    for folder in folder_list:
+        if os.path.isdir(folder):
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        skipped_dirs.append(entry.name)
+                        if verbose:
+                            print(f"Skipped directory: {entry.name}")
+                        summary["skipped"] += 1
+                    elif entry.is_file(follow_symlinks=False):
+                        # Grab the size here so workers don't re-stat every file
+                        try:
+                            all_files.append((entry.path, entry.stat(follow_symlinks=False).st_size))
+                        except OSError:
+                            all_files.append((entry.path, None))
+                    else:
+                        if verbose:
+                            print(f"Skipped (not a file): {entry.name}")
+                        summary["skipped"] += 1
+
+    summary["total"] = len(all_files)
+
+    # Pre-create the shared move targets once up front
+    _ensure_dir(riff_dir)
+    _ensure_dir(failed_dir)
+
+    completed = 0
+    total = len(all_files)
+
+    # 1 MiB buffers: log writes hit the disk in big batches instead of
+    # flushing on every line while draining results
+    with open(match_log, "w", encoding="utf-8", buffering=1048576) as f_match, \
+         open(notmatch_log, "w", encoding="utf-8", buffering=1048576) as f_notmatch, \
+         open(changed_log, "w", encoding="utf-8", buffering=1048576) as f_changed:
+
+        for name in skipped_dirs:
+            f_notmatch.write(f"{name} --> skipped directory\n")
+
+        def log_result(fname, timestamp, status, sizes):
+            nonlocal completed
+            completed += 1
+
+            if verbose:
+                print(f"\n--- Checking file: {fname} ---")
+            else:
+                print_progress(completed, total)
+
+            if status == "match":
+                f_match.write(f"{fname} --> {timestamp}\n")
+                if verbose:
+                    print(f"Matched timestamp: {timestamp}")
+                summary["match"] += 1
+
+            elif status == "notmatch":
+                f_notmatch.write(f"{fname} --> {timestamp}\n")
+                if verbose:
+                    print(timestamp)
+                summary["notmatch"] += 1
+
+            elif status == "skip":
+                if verbose:
+                    print("Skipped (not a file).")
+                summary["skipped"] += 1
+
+            else:
+                f_notmatch.write(f"{fname} --> Unknown error\n")
+                if verbose:
+                    print("Other error, logged as not match.")
+                summary["notmatch"] += 1
+
+            if sizes:
+                size_before, size_after = sizes
+                if size_after > size_before:
+                    f_changed.write(f"{fname} --> size increased ({size_before} → {size_after} bytes)\n")
+                    if verbose:
+                        print(f"File size increased ({size_before} → {size_after} bytes).")
+                    summary["increased"] += 1
+                elif size_after < size_before:
+                    f_changed.write(f"{fname} --> size decreased ({size_before} → {size_after} bytes)\n")
+                    if verbose:
+                        print(f"File size decreased ({size_before} → {size_after} bytes).")
+                    summary["decreased"] += 1
+
+            if verbose:
+                print(f"[{completed}/{total}] Finished processing: {fname}")
+
+        # Phase 1: parse filenames in parallel (no subprocess work).
+        # Slices of 256 files per task amortize the pickle + pipe
+        # round-trip that a one-future-per-file submit would pay.
+        matched_entries = []
+
+        chunks = [all_files[i:i + 256] for i in range(0, len(all_files), 256)]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_results in executor.map(parse_files_chunk, chunks):
+                for fname, timestamp, status, payload in chunk_results:
+                    if status == "parsed":
+                        fpath, exif_timestamp, size_before = payload
+                        matched_entries.append((fname, timestamp, fpath, exif_timestamp, size_before))
+                    else:
+                        log_result(fname, timestamp, status, payload)
+
+        # Phase 2: one exiftool invocation writes EXIF for every match
+        for fname, timestamp, status, sizes in run_exiftool_batch(matched_entries):
+            log_result(fname, timestamp, status, sizes)
+
+    if not verbose and total > 0:
+        print()
+
+    print("\n=== Summary ===")
+    print(f"Total files scanned: {summary['total']}")
+    print(f"Matched: {summary['match']}")
+    print(f"Not matched: {summary['notmatch']}")
+    print(f"Skipped: {summary['skipped']}")
+    print(f"Size increased: {summary['increased']}")
+    print(f"Size decreased: {summary['decreased']}")
+
+if __name__ == "__main__":
+    main()
@@ -1,252 +1,342 @@
-import os
-import re
-import json
-import argparse
-from datetime import datetime
-
-from textual.app import App, ComposeResult
-from textual.widgets import Header, Footer, Static, Button, ScrollView
-from textual.containers import Vertical, Horizontal
-
-# Pattern loading
-
-def load_external_patterns(cwd: str):
-    json_path = os.path.join(cwd, "pattern.json")
-    if not os.path.isfile(json_path):
-        return None
-
-    try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        patterns = []
-        for item in data.get("patterns", []):
-            patterns.append({
-                "regex": re.compile(item["regex"]),
-                "group": item.get("group", 1),
-                "formats": item["formats"]
-            })
-
-        return patterns
-
-    except Exception as e:
-        print(f"[red]Error loading pattern.json:[/red] {e}")
-        return None
-
-
-# Built-in main patterns (used if pattern.json is missing)
-BUILTIN_PATTERNS = [
-    {
-        "regex": re.compile(r'^(.*)=_=(\d{4}-\d{2}-\d{2}T\d{6}(?:\.\d{3})?Z).*'),
-        "group": 2,
-        "formats": ["%Y-%m-%dT%H%M%S.%fZ", "%Y-%m-%dT%H%M%SZ"]
-    },
-    {
-        "regex": re.compile(r'^(.*)__(\d{4}-\d{2}-\d{2}T\d{6}(?:\.\d{3})?Z).*'),
-        "group": 2,
-        "formats": ["%Y-%m-%dT%H%M%S.%fZ", "%Y-%m-%dT%H%M%SZ"]
-    },
-    {
-        "regex": re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}\.\d{2}\.\d{2}).*'),
-        "group": 1,
-        "formats": ["%Y-%m-%d %H.%M.%S"]
-    }
-]
-
-# Built-in fallback patterns
-FALLBACK_SPACE = re.compile(r'^(\d{2})(\d{2})(\d{2})\s+.*')
-FALLBACK_DASH = re.compile(r'^(\d{2})(\d{2})(\d{2})-.*')
-
-
-# Pattern matching logic
-
-def classify_filename(fname: str, patterns):
-    """Return (kind, info_dict) where kind is 'main', 'fallback', or 'none'."""
-    # Try main patterns
-    for pat in patterns:
-        m = pat["regex"].match(fname)
-        if m:
-            ts = m.group(pat["group"])
-            # We don't care if parsing fails here for the browser; just show the raw timestamp
-            return "main", {
-                "filename": fname,
-                "pattern": pat["regex"].pattern,
-                "timestamp": ts,
-            }
-
-    # Try fallback 1
-    m1 = FALLBACK_SPACE.match(fname)
-    if m1:
-        yy, mm, dd = m1.groups()
-        try:
-            datetime(int("20" + yy), int(mm), int(dd))
-            ts = f"20{yy}-{mm}-{dd}"
-            return "fallback", {
-                "filename": fname,
-                "pattern": "YYMMDD<space>",
-                "timestamp": ts,
-            }
-        except ValueError:
-            pass
-
-    # Try fallback 2
-    m2 = FALLBACK_DASH.match(fname)
-    if m2:
-        yy, mm, dd = m2.groups()
-        try:
-            datetime(int("20" + yy), int(mm), int(dd))
-            ts = f"20{yy}-{mm}-{dd}"
-            return "fallback", {
-                "filename": fname,
-                "pattern": "YYMMDD-",
-                "timestamp": ts,
-            }
-        except ValueError:
-            pass
-
-    # No match
-    return "none", {
-        "filename": fname,
-        "pattern": None,
-        "timestamp": None,
-    }
-
-
-# Arg parsing
-
-def parse_args():
-    parser = argparse.ArgumentParser(description="Pattern Browser (read-only, non-recursive)")
-    parser.add_argument(
-        "--dir",
-        required=True,
-        help="Comma-separated list of directories to scan (non-recursive)"
-    )
-    return parser.parse_args()
-
-
-# Textual App
-
-class PatternBrowser(App):
-    TITLE = "Pattern Browser"
-    SUB_TITLE = "Pattern.json + built-in patterns (read-only)"
-
-    def __init__(self, results, summary, **kwargs):
-        super().__init__(**kwargs)
-        self.results = results
-        self.summary = summary
-
-    def compose(self) -> ComposeResult:
-        yield Header()
-
-        yield Vertical(
-            Static("", id="summary_box"),
-            Horizontal(
-                Button("Show matched files", id="btn_matched"),
-                Button("Show not matched files", id="btn_notmatched"),
-                id="buttons_row"
-            ),
-            ScrollView(Static("", id="output_box"), id="scroll_area"),
-        )
-
-        yield Footer()
-
-    def on_mount(self):
-        # Set summary text
-        summary_box = self.query_one("#summary_box", Static)
-        s = self.summary
-        summary_text = (
-            f"[b]Pattern Browser Summary[/b]\n"
-            f"Total files: {s['total']}\n"
-            f"Matched (main + fallback): {s['matched_total']}\n"
-            f"  - Main matches: {s['main']}\n"
-            f"  - Fallback matches: {s['fallback']}\n"
-            f"Not matched: {s['none']}\n"
-        )
-        summary_box.update(summary_text)
-
-    def on_button_pressed(self, event: Button.Pressed):
-        output_box = self.query_one("#output_box", Static)
-
-        if event.button.id == "btn_matched":
-            lines = []
-            for item in self.results:
-                if item["kind"] in ("main", "fallback"):
-                    color = "green" if item["kind"] == "main" else "yellow"
-                    lines.append(
-                        f"[{color}]{item['filename']}[/{color}]\n"
-                        f"[{color}]--- matched pattern:[/{color}] {item['pattern']}\n"
-                        f"[{color}]--- extracted timestamp:[/{color}] {item['timestamp']}\n"
-                    )
-            if not lines:
-                lines = ["[yellow]No matched files.[/yellow]\n"]
-            output_box.update("\n".join(lines))
-
-        elif event.button.id == "btn_notmatched":
-            lines = []
-            for item in self.results:
-                if item["kind"] == "none":
-                    lines.append(
-                        f"[red]{item['filename']}[/red]\n"
-                        f"[red]--- no pattern matched[/red]\n"
-                    )
-            if not lines:
-                lines = ["[green]All files matched some pattern.[/green]\n"]
-            output_box.update("\n".join(lines))
-
-
-# Main entry
-
-def main():
-    args = parse_args()
-    cwd = os.getcwd()
-
-    # Directories to scan (non-recursive)
-    folder_list = [os.path.abspath(p.strip()) for p in args.dir.split(",") if p.strip()]
-
-    # Load patterns
-    external = load_external_patterns(cwd)
-    patterns = external if external else BUILTIN_PATTERNS
-
-    # Scan files (non-recursive)
-    results = []
-    main_count = 0
-    fallback_count = 0
-    none_count = 0
-    total_files = 0
-
-    for folder in folder_list:
-        if not os.path.isdir(folder):
-            print(f"[red]Directory not found:[/red] {folder}")
-            continue
-
-        for entry in os.listdir(folder):
-            fpath = os.path.join(folder, entry)
-            if os.path.isdir(fpath):
-                continue
-
-            kind, info = classify_filename(entry, patterns)
-            info["kind"] = kind
-            results.append(info)
-
-            total_files += 1
-            if kind == "main":
-                main_count += 1
-            elif kind == "fallback":
-                fallback_count += 1
-            else:
-                none_count += 1
-
-    summary = {
-        "total": total_files,
-        "main": main_count,
-        "fallback": fallback_count,
-        "matched_total": main_count + fallback_count,
-        "none": none_count,
-    }
-
-    app = PatternBrowser(results=results, summary=summary)
-    app.run()
-
-
-if __name__ == "__main__":
+import os
+import re
+import json
+import argparse
+import functools
+from array import array
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from textual.app import App, ComposeResult
+from textual.widgets import Header, Footer, Static, Button, ScrollView
+from textual.containers import Vertical, Horizontal
+
+# Optional google-re2: linear-time matching, immune to backtracking
+# blowups from the leading .* in the ISO patterns
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+
+def compile_pattern(pattern: str):
+    """Compile with google-re2 when available, falling back to re."""
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except re2.error:
+            pass
+    return re.compile(pattern)
+
+
+# Optional orjson: a much faster JSON decoder for pattern.json when it
+# is installed; the stdlib parser is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Pattern loading
+
+# Parsed + compiled once per (path, mtime); the JSON is only re-read
+# when the file actually changes, so a stale check costs one stat
+@functools.lru_cache(maxsize=1)
+def _compile_patterns(json_path: str, mtime_ns: int):
+    with open(json_path, "rb") as f:
+        raw = f.read()
+    data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+    patterns = []
+    for item in data.get("patterns", []):
+        patterns.append({
+            "regex": compile_pattern(item["regex"]),
+            "group": item.get("group", 1),
+            "formats": item["formats"]
+        })
+
+    return patterns
+
+
+def load_external_patterns(cwd: str):
+    json_path = os.path.join(cwd, "pattern.json")
+    try:
+        mtime_ns = os.stat(json_path).st_mtime_ns
+    except OSError:
+        return None
+
+    try:
+        return _compile_patterns(json_path, mtime_ns)
+    except Exception as e:
+        print(f"[red]Error loading pattern.json:[/red] {e}")
+        return None
+
+
+# Built-in main patterns (used if pattern.json is missing)
+BUILTIN_PATTERNS = [
+    {
+        "regex": compile_pattern(r'^(.*)=_=(\d{4}-\d{2}-\d{2}T\d{6}(?:\.\d{3})?Z).*'),
+        "group": 2,
+        "formats": ["%Y-%m-%dT%H%M%S.%fZ", "%Y-%m-%dT%H%M%SZ"]
+    },
+    {
+        "regex": compile_pattern(r'^(.*)__(\d{4}-\d{2}-\d{2}T\d{6}(?:\.\d{3})?Z).*'),
+        "group": 2,
+        "formats": ["%Y-%m-%dT%H%M%S.%fZ", "%Y-%m-%dT%H%M%SZ"]
+    },
+    {
+        "regex": compile_pattern(r'^(\d{4}-\d{2}-\d{2} \d{2}\.\d{2}\.\d{2}).*'),
+        "group": 1,
+        "formats": ["%Y-%m-%d %H.%M.%S"]
+    }
+]
+
+# Optional Hyperscan prefilter: all patterns compiled into one SIMD
+# multi-pattern database. Hyperscan can't extract capture groups, so it
+# only tells us *which* patterns hit; classify_filename then runs just
+# the winning pattern(s) instead of trying every one.
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+
+def build_prefilter(patterns):
+    """Compile the main patterns into a Hyperscan database, or None."""
+    if hyperscan is None:
+        return None
+
+    expressions = [pat["regex"].pattern.encode("utf-8") for pat in patterns]
+
+    try:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=expressions,
+            ids=list(range(len(expressions))),
+            flags=[hyperscan.HS_FLAG_PREFILTER | hyperscan.HS_FLAG_SINGLEMATCH] * len(expressions),
+        )
+        return db
+    except Exception as e:
+        print(f"[yellow]Hyperscan prefilter unavailable:[/yellow] {e}")
+        return None
+
+
+def prefilter_hits(db, fname: str):
+    """Return the set of pattern ids that may match fname, or None if no db."""
+    if db is None:
+        return None
+    hits = set()
+    db.scan(fname.encode("utf-8"),
+            match_event_handler=lambda pid, start, end, flags, ctx: hits.add(pid))
+    return hits
+
+
+# Per-file record: a NamedTuple is ~3x smaller than the dict it
+# replaces and attribute access is faster than key lookup
+class FileRec(NamedTuple):
+    filename: str
+    pattern: Optional[str]
+    timestamp: Optional[str]
+
+
+# Kind codes for the parallel results arrays
+KIND_NONE = 0
+KIND_MAIN = 1
+KIND_FALLBACK = 2
+KIND_CODES = {"none": KIND_NONE, "main": KIND_MAIN, "fallback": KIND_FALLBACK}
+
+
+# Pattern matching logic
+
+def classify_filename(fname: str, patterns, hits=None):
+    """Return (kind, FileRec) where kind is 'main', 'fallback', or 'none'.
+
+    hits, when given, is the prefilter id set; patterns whose id is
+    absent cannot match and are skipped without running the regex."""
+    # Try main patterns
+    for i, pat in enumerate(patterns):
+        if hits is not None and i not in hits:
+            continue
+        m = pat["regex"].match(fname)
+        if m:
+            ts = m.group(pat["group"])
+            # We don't care if parsing fails here for the browser; just show the raw timestamp
+            return "main", FileRec(fname, pat["regex"].pattern, ts)
+
+    # Try the YYMMDD fallbacks: six leading digits plus a space/dash
+    # separator is all the regexes ever checked, so cheap character
+    # tests replace the regex engine here.
+    if len(fname) >= 7 and fname[:6].isdigit() and (fname[6].isspace() or fname[6] == "-"):
+        yy, mm, dd = fname[0:2], fname[2:4], fname[4:6]
+        try:
+            datetime(int("20" + yy), int(mm), int(dd))
+            return "fallback", FileRec(
+                fname,
+                "YYMMDD-" if fname[6] == "-" else "YYMMDD<space>",
+                f"20{yy}-{mm}-{dd}",
+            )
+        except ValueError:
+            pass
+
+    # No match
+    return "none", FileRec(fname, None, None)
+
+
+# Arg parsing
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pattern Browser (read-only, non-recursive)")
+    parser.add_argument(
+        "--dir",
+        required=True,
+        help="Comma-separated list of directories to scan (non-recursive)"
+    )
+    return parser.parse_args()
+
+
+# Textual App
+
+class PatternBrowser(App):
+    TITLE = "Pattern Browser"
+    SUB_TITLE = "Pattern.json + built-in patterns (read-only)"
+
+    # Results are stored as parallel arrays (SoA) instead of one dict
+    # per file: the filter passes below only scan the 1-byte kinds
+    # array, and 100k dicts' worth of memory overhead goes away.
+    def __init__(self, filenames, patterns, timestamps, kinds, summary, **kwargs):
+        super().__init__(**kwargs)
+        self.filenames = filenames
+        self.patterns = patterns
+        self.timestamps = timestamps
+        self.kinds = kinds  # array('b'): 0=none, 1=main, 2=fallback
+        self.summary = summary
+
+    def compose(self) -> ComposeResult:
+        yield Header()
+
+        yield Vertical(
+            Static("", id="summary_box"),
+            Horizontal(
+                Button("Show matched files", id="btn_matched"),
+                Button("Show not matched files", id="btn_notmatched"),
+                id="buttons_row"
+            ),
+            ScrollView(Static("", id="output_box"), id="scroll_area"),
+        )
+
+        yield Footer()
+
+    def on_mount(self):
+        # Set summary text
+        summary_box = self.query_one("#summary_box", Static)
+        s = self.summary
+        summary_text = (
+            f"[b]Pattern Browser Summary[/b]\n"
+            f"Total files: {s['total']}\n"
+            f"Matched (main + fallback): {s['matched_total']}\n"
+            f"  - Main matches: {s['main']}\n"
+            f"  - Fallback matches: {s['fallback']}\n"
+            f"Not matched: {s['none']}\n"
+        )
+        summary_box.update(summary_text)
+
+    def on_button_pressed(self, event: Button.Pressed):
+        output_box = self.query_one("#output_box", Static)
+
+        if event.button.id == "btn_matched":
+            lines = []
+            for i, kind in enumerate(self.kinds):
+                if kind:  # 1=main, 2=fallback
+                    color = "green" if kind == KIND_MAIN else "yellow"
+                    lines.append(
+                        f"[{color}]{self.filenames[i]}[/{color}]\n"
+                        f"[{color}]--- matched pattern:[/{color}] {self.patterns[i]}\n"
+                        f"[{color}]--- extracted timestamp:[/{color}] {self.timestamps[i]}\n"
+                    )
+            if not lines:
+                lines = ["[yellow]No matched files.[/yellow]\n"]
+            output_box.update("\n".join(lines))
+
+        elif event.button.id == "btn_notmatched":
+            lines = []
+            for i, kind in enumerate(self.kinds):
+                if kind == KIND_NONE:
+                    lines.append(
+                        f"[red]{self.filenames[i]}[/red]\n"
+                        f"[red]--- no pattern matched[/red]\n"
+                    )
+            if not lines:
+                lines = ["[green]All files matched some pattern.[/green]\n"]
+            output_box.update("\n".join(lines))
+
+
+# Main entry
+
+def main():
+    args = parse_args()
+    cwd = os.getcwd()
+
+    # Directories to scan (non-recursive)
+    folder_list = [os.path.abspath(p.strip()) for p in args.dir.split(",") if p.strip()]
+
+    # Load patterns
+    external = load_external_patterns(cwd)
+    patterns = external if external else BUILTIN_PATTERNS
+    prefilter = build_prefilter(patterns)
+
+    # Scan files (non-recursive) into parallel arrays
+    filenames = []
+    matched_patterns = []
+    timestamps = []
+    kinds = array("b")
+    main_count = 0
+    fallback_count = 0
+    none_count = 0
+    total_files = 0
+
+    for folder in folder_list:
+        if not os.path.isdir(folder):
+            print(f"[red]Directory not found:[/red] {folder}")
+            continue
+
+        # scandir's DirEntry carries the d_type from readdir, so the
+        # directory check needs no per-entry stat syscall
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    continue
+
+                name = entry.name
+                kind, info = classify_filename(name, patterns, prefilter_hits(prefilter, name))
+                filenames.append(info.filename)
+                matched_patterns.append(info.pattern)
+                timestamps.append(info.timestamp)
+                kinds.append(KIND_CODES[kind])
+
+                total_files += 1
+                if kind == "main":
+                    main_count += 1
+                elif kind == "fallback":
+                    fallback_count += 1
+                else:
+                    none_count += 1
+
+    summary = {
+        "total": total_files,
+        "main": main_count,
+        "fallback": fallback_count,
+        "matched_total": main_count + fallback_count,
+        "none": none_count,
+    }
+
+    app = PatternBrowser(
+        filenames=filenames,
+        patterns=matched_patterns,
+        timestamps=timestamps,
+        kinds=kinds,
+        summary=summary,
+    )
+    app.run()
+
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,115 +1,237 @@
-import os
-import sys
-import subprocess
-import shutil
-
-# Global counters
-total_scanned = 0
-changed_to_webp = 0
-not_changed = 0
-
-def run_exiftool(filepath):
-    """Run exiftool and return the value of 'File Type'."""
-    try:
-        result = subprocess.run(
-            ["exiftool", "-FileType", filepath],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        output = result.stdout
-        for line in output.splitlines():
-            if line.startswith("File Type"):
-                return line.split(":", 1)[1].strip()
-    except Exception as e:
-        print(f"Error running exiftool on {filepath}: {e}")
-    return None
-
-
-def process_path(path, changed_dir, processed_dir):
-    """Process a single directory path (non-recursive)."""
-    global total_scanned, changed_to_webp, not_changed
-
-    if not os.path.isdir(path):
-        print(f"Skipping: {path} (not a directory)")
-        return
-
-    for entry in os.listdir(path):
-        full_path = os.path.join(path, entry)
-
-        if not os.path.isfile(full_path):
-            continue  # skip folders
-
-        total_scanned += 1
-
-        file_type = run_exiftool(full_path)
-
-        # Accept both WEBP and Extended WEBP
-        is_webp = file_type in ("WEBP", "Extended WEBP")
-
-        if is_webp:
-            base, ext = os.path.splitext(entry)
-
-            # Only clone if extension is NOT already .webp
-            if ext.lower() != ".webp":
-                new_name = base + ".webp"
-                new_path = os.path.join(changed_dir, new_name)
-
-                print(f"[+] WEBP detected ({file_type}): {entry}")
-                print(f"    Creating copy as: {new_name}")
-
-                try:
-                    shutil.copy2(full_path, new_path)
-                    print(f"    Copy successful.")
-                    changed_to_webp += 1
-
-                    # Move original JPG/JPEG → processed/
-                    if ext.lower() in (".jpg", ".jpeg"):
-                        processed_target = os.path.join(processed_dir, entry)
-                        shutil.move(full_path, processed_target)
-                        print(f"    Moved original JPG to processed/: {entry}")
-                    else:
-                        print(f"    Original file is not JPG, leaving in place.")
-
-                except Exception as e:
-                    print(f"    Error copying file: {e}")
-                    not_changed += 1
-            else:
-                print(f"[=] Already .webp: {entry}")
-                not_changed += 1
-
-        else:
-            print(f"[-] Not WEBP: {entry} ({file_type})")
-            not_changed += 1
-
-
-def main():
-    global total_scanned, changed_to_webp, not_changed
-
-    if len(sys.argv) < 2:
-        print("Usage: python script.py <path1,path2,path3>")
-        sys.exit(1)
-
-    input_paths = sys.argv[1]
-    paths = [os.path.abspath(p.strip()) for p in input_paths.split(",")]
-
-    # Create folders where the script is executed
-    script_cwd = os.getcwd()
-    changed_dir = os.path.join(script_cwd, "changed")
-    processed_dir = os.path.join(script_cwd, "processed")
-
-    os.makedirs(changed_dir, exist_ok=True)
-    os.makedirs(processed_dir, exist_ok=True)
-
-    for path in paths:
-        process_path(path, changed_dir, processed_dir)
-
-    # Print summary
-    print("\n=== Summary ===")
-    print(f"Total files scanned: {total_scanned}")
-    print(f"Files changed to WEBP: {changed_to_webp}")
-    print(f"Files that were not changed: {not_changed}")
-
-
-if __name__ == "__main__":
+import os
+import sys
+import subprocess
+import shutil
+import atexit
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # non-POSIX; fast_copy just falls back to copy2
+
+# btrfs/XFS reflink ioctl: clones extents instead of copying bytes
+FICLONE = 0x40049409
+
+# Global counters
+total_scanned = 0
+changed_to_webp = 0
+not_changed = 0
+
+
+class ExiftoolWorker:
+    """One long-lived exiftool process in -stay_open batch mode (no fork per file)."""
+
+    def __init__(self, exiftool_path):
+        self.proc = subprocess.Popen(
+            [exiftool_path, "-stay_open", "True", "-@", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+            # close_fds=False lets CPython launch via posix_spawn
+            # instead of fork, skipping the page-table copy
+            close_fds=False
+        )
+
+    def execute(self, *args):
+        cmd = "".join(arg + "\n" for arg in args) + "-execute\n"
+        self.proc.stdin.write(cmd.encode("utf-8"))
+        self.proc.stdin.flush()
+
+        output = b""
+        while True:
+            chunk = self.proc.stdout.read(4096)
+            if not chunk:
+                break
+            output += chunk
+            if output.rstrip().endswith(b"{ready}"):
+                break
+
+        return output.decode("utf-8", "replace").rsplit("{ready}", 1)[0]
+
+    def close(self):
+        try:
+            self.proc.stdin.write(b"-stay_open\nFalse\n")
+            self.proc.stdin.flush()
+            self.proc.wait(timeout=5)
+        except Exception:
+            self.proc.kill()
+
+
+def sniff_type(filepath):
+    """Detect WEBP/JPEG from the first 12 bytes; None if unrecognized."""
+    try:
+        with open(filepath, "rb") as f:
+            header = f.read(12)
+    except OSError:
+        return None
+
+    if header[0:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "WEBP"
+    if header[0:3] == b"\xff\xd8\xff":
+        return "JPEG"
+    return None
+
+
+exiftool_worker = None
+exiftool_lock = threading.Lock()
+
+def run_exiftool(filepath):
+    """Query the stay-open exiftool worker for 'File Type'."""
+    global exiftool_worker
+    try:
+        # One worker shared by all threads; its stdin/stdout is serialized
+        with exiftool_lock:
+            if exiftool_worker is None:
+                exiftool_worker = ExiftoolWorker("exiftool")
+                atexit.register(exiftool_worker.close)
+
+            output = exiftool_worker.execute("-FileType", filepath)
+
+        for line in output.splitlines():
+            if line.startswith("File Type"):
+                return line.split(":", 1)[1].strip()
+    except Exception as e:
+        print(f"Error running exiftool on {filepath}: {e}")
+    return None
+
+
+def fast_copy(src, dst):
+    """Copy src to dst, trying reflink then copy_file_range before
+    falling back to shutil.copy2; metadata is preserved either way."""
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            # Reflink first: on clone-capable filesystems the "copy" is
+            # a metadata operation, no bytes move at all
+            if fcntl is not None:
+                try:
+                    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                    shutil.copystat(src, dst)
+                    return dst
+                except OSError:
+                    pass
+
+            # In-kernel copy next: no userspace read/write bounce
+            if hasattr(os, "copy_file_range"):
+                try:
+                    while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30):
+                        pass
+                    shutil.copystat(src, dst)
+                    return dst
+                except OSError:
+                    pass
+    except OSError:
+        pass
+
+    shutil.copy2(src, dst)
+    return dst
+
+
+def handle_entry(entry, full_path, changed_dir, processed_dir):
+    """Sniff and copy/move one file; returns counts to merge at the end."""
+    counts = Counter(scanned=1)
+
+    # Magic bytes cover WEBP/JPEG; only unknown headers pay for exiftool
+    file_type = sniff_type(full_path)
+    if file_type is None:
+        file_type = run_exiftool(full_path)
+
+    # Accept both WEBP and Extended WEBP
+    is_webp = file_type in ("WEBP", "Extended WEBP")
+
+    if is_webp:
+        base, ext = os.path.splitext(entry)
+
+        # Only clone if extension is NOT already .webp
+        if ext.lower() != ".webp":
+            new_name = base + ".webp"
+            new_path = os.path.join(changed_dir, new_name)
+
+            print(f"[+] WEBP detected ({file_type}): {entry}")
+            print(f"    Creating copy as: {new_name}")
+
+            try:
+                fast_copy(full_path, new_path)
+                print(f"    Copy successful.")
+                counts["changed"] += 1
+
+                # Move original JPG/JPEG → processed/
+                if ext.lower() in (".jpg", ".jpeg"):
+                    processed_target = os.path.join(processed_dir, entry)
+                    shutil.move(full_path, processed_target)
+                    print(f"    Moved original JPG to processed/: {entry}")
+                else:
+                    print(f"    Original file is not JPG, leaving in place.")
+
+            except Exception as e:
+                print(f"    Error copying file: {e}")
+                counts["not_changed"] += 1
+        else:
+            print(f"[=] Already .webp: {entry}")
+            counts["not_changed"] += 1
+
+    else:
+        print(f"[-] Not WEBP: {entry} ({file_type})")
+        counts["not_changed"] += 1
+
+    return counts
+
+
+def process_path(path, changed_dir, processed_dir):
+    """Process a single directory path (non-recursive, I/O in threads)."""
+    global total_scanned, changed_to_webp, not_changed
+
+    if not os.path.isdir(path):
+        print(f"Skipping: {path} (not a directory)")
+        return
+
+    with os.scandir(path) as it:
+        entries = [(de.name, de.path) for de in it if de.is_file(follow_symlinks=False)]
+
+    # Sniff reads and copies/moves overlap across threads; per-file
+    # counts come back as Counters so the globals are updated once here
+    counts = Counter()
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        for c in ex.map(lambda e: handle_entry(e[0], e[1], changed_dir, processed_dir), entries):
+            counts.update(c)
+
+    total_scanned += counts["scanned"]
+    changed_to_webp += counts["changed"]
+    not_changed += counts["not_changed"]
+
+
+def main():
+    global total_scanned, changed_to_webp, not_changed
+
+    if len(sys.argv) < 2:
+        print("Usage: python script.py <path1,path2,path3>")
+        sys.exit(1)
+
+    input_paths = sys.argv[1]
+    paths = [os.path.abspath(p.strip()) for p in input_paths.split(",")]
+
+    # Create folders where the script is executed
+    script_cwd = os.getcwd()
+    changed_dir = os.path.join(script_cwd, "changed")
+    processed_dir = os.path.join(script_cwd, "processed")
+
+    os.makedirs(changed_dir, exist_ok=True)
+    os.makedirs(processed_dir, exist_ok=True)
+
+    for path in paths:
+        process_path(path, changed_dir, processed_dir)
+
+    # Print summary
+    print("\n=== Summary ===")
+    print(f"Total files scanned: {total_scanned}")
+    print(f"Files changed to WEBP: {changed_to_webp}")
+    print(f"Files that were not changed: {not_changed}")
+
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
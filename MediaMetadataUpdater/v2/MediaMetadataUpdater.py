@@ -1,353 +1,736 @@
-import os
-import re
-import shutil
-import subprocess
-import argparse
-import math
-import json
-from datetime import datetime
-from concurrent.futures import ProcessPoolExecutor, as_completed
-
-# Default folders (can be overridden by --directory)
-folders = r"/data"
-
-cwd = os.getcwd()
-
-# LOG FILES
-match_log = os.path.join(cwd, "0Match.log")
-notmatch_log = os.path.join(cwd, "0NotMatch.log")
-changed_log = os.path.join(cwd, "0FileChanged.log")
-
-summary = {
-    "total": 0,
-    "match": 0,
-    "notmatch": 0,
-    "skipped": 0,
-    "increased": 0,
-    "decreased": 0
-}
-
-# Load external pattern.json
-def load_external_patterns():
-    json_path = os.path.join(cwd, "pattern.json")
-    if not os.path.isfile(json_path):
-        return None
-
-    try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        patterns = []
-        for item in data.get("patterns", []):
-            patterns.append({
-                "regex": re.compile(item["regex"]),
-                "group": item.get("group", 1),
-                "formats": item["formats"]
-            })
-
-        return patterns
-
-    except Exception as e:
-        print(f"Error loading pattern.json: {e}")
-        return None
-
-# Built-in fallback patterns
-pattern_fb_space = re.compile(r'^(\d{2})(\d{2})(\d{2})\s+.*')
-pattern_fb_dash = re.compile(r'^(\d{2})(\d{2})(\d{2})-.*')
-
-# Built-in patterns (used only if pattern.json is missing)
-builtin_patterns = [
-    {
-        "regex": re.compile(r'^(.*)=_=(\d{4}-\d{2}-\d{2}T\d{6}(?:\.\d{3})?Z).*'),
-        "group": 2,
-        "formats": ["%Y-%m-%dT%H%M%S.%fZ", "%Y-%m-%dT%H%M%SZ"]
-    },
-    {
-        "regex": re.compile(r'^(.*)__(\d{4}-\d{2}-\d{2}T\d{6}(?:\.\d{3})?Z).*'),
-        "group": 2,
-        "formats": ["%Y-%m-%dT%H%M%S.%fZ", "%Y-%m-%dT%H%M%SZ"]
-    },
-    {
-        "regex": re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}\.\d{2}\.\d{2}).*'),
-        "group": 1,
-        "formats": ["%Y-%m-%d %H.%M.%S"]
-    }
-]
-
-# Argument Parser
-def parse_args():
-    parser = argparse.ArgumentParser(description="Media Metadata Updater")
-
-    parser.add_argument(
-        "--workers",
-        default="80",
-        help="Percentage of CPU threads to use (e.g., 50, 80, 100) or 'all'"
-    )
-
-    parser.add_argument(
-        "--verbose",
-        action="store_true",
-        help="Print detailed logs for each file instead of a progress bar"
-    )
-
-    parser.add_argument(
-        "--directory",
-        help="Comma-separated list of directories to scan (overrides default folders)"
-    )
-
-    return parser.parse_args()
-
-# Progress Bar
-def print_progress(current, total, bar_length=40):
-    if total == 0:
-        return
-    percent = current / total
-    filled = int(bar_length * percent)
-    bar = "█" * filled + "░" * (bar_length - filled)
-    print(f"\rProcessing files: |{bar}| {current}/{total} ({percent*100:.1f}%)", end="", flush=True)
-
-# Move Helpers
-def safe_move(src, dst_dir):
-    os.makedirs(dst_dir, exist_ok=True)
-    target = os.path.join(dst_dir, os.path.basename(src))
-    shutil.copy2(src, target)
-    os.remove(src)
-    return target
-
-def move_to_riff(fpath):
-    return safe_move(fpath, os.path.join(cwd, "riff"))
-
-def move_to_failed(fpath):
-    return safe_move(fpath, os.path.join(cwd, "failed"))
-
-def move_to_manual(fpath):
-    folder = os.path.dirname(fpath)
-    manual_dir = os.path.join(folder, "manual")
-    os.makedirs(manual_dir, exist_ok=True)
-
-    base = os.path.basename(fpath)
-    target = os.path.join(manual_dir, base)
-
-    if os.path.exists(target):
-        name, ext = os.path.splitext(base)
-        counter = 1
-        while True:
-            new_name = f"{name} ({counter}){ext}"
-            new_target = os.path.join(manual_dir, new_name)
-            if not os.path.exists(new_target):
-                target = new_target
-                break
-            counter += 1
-
-    shutil.copy2(fpath, target)
-    os.remove(fpath)
-    return target
-
-# Process File
-def process_file(fpath):
-    fname = os.path.basename(fpath)
-    if not os.path.isfile(fpath):
-        return (fname, None, "skip", None)
-
-    try:
-        size_before = os.path.getsize(fpath)
-    except OSError:
-        return (fname, None, "error_size_before", None)
-
-    timestamp_str = None
-    dt = None
-
-    # Load external patterns if available
-    external = load_external_patterns()
-    patterns = external if external else builtin_patterns
-
-    # Try external/builtin patterns
-    for pat in patterns:
-        m = pat["regex"].match(fname)
-        if m:
-            timestamp_str = m.group(pat["group"])
-            for fmt in pat["formats"]:
-                try:
-                    dt = datetime.strptime(timestamp_str, fmt)
-                    break
-                except ValueError:
-                    continue
-            if dt:
-                break
-
-    # If still no match, try fallback patterns
-    if not dt:
-        m_fb1 = pattern_fb_space.match(fname)
-        if m_fb1:
-            yy, mm, dd = m_fb1.groups()
-            try:
-                dt = datetime(int("20" + yy), int(mm), int(dd))
-                timestamp_str = f"20{yy}-{mm}-{dd}"
-            except ValueError:
-                moved = move_to_failed(fpath)
-                return (fname, f"Fallback1 YYMMDD parse error → moved to {moved}", "notmatch", (size_before, size_before))
-
-        else:
-            m_fb2 = pattern_fb_dash.match(fname)
-            if m_fb2:
-                yy, mm, dd = m_fb2.groups()
-                try:
-                    dt = datetime(int("20" + yy), int(mm), int(dd))
-                    timestamp_str = f"20{yy}-{mm}-{dd}"
-                except ValueError:
-                    moved = move_to_failed(fpath)
-                    return (fname, f"Fallback2 YYMMDD parse error → moved to {moved}", "notmatch", (size_before, size_before))
-            else:
-                moved = move_to_failed(fpath)
-                return (fname, f"No pattern matched → moved to {moved}", "notmatch", (size_before, size_before))
-
-    # Write EXIF timestamp
-    exif_timestamp = dt.strftime("%Y:%m:%d %H:%M:%S")
-
-    result = subprocess.run([
-        os.path.join(cwd, "exiftool"),
-        "-overwrite_original",
-        f"-DateTimeOriginal={exif_timestamp}",
-        f"-AllDates={exif_timestamp}",
-        f"-CreationTime={exif_timestamp}",
-        f"-ModifyDate={exif_timestamp}",
-        fpath
-    ], capture_output=True, text=True)
-
-    try:
-        size_after = os.path.getsize(fpath)
-    except OSError:
-        size_after = size_before
-
-    if result.returncode == 0:
-        return (fname, timestamp_str, "match", (size_before, size_after))
-
-    err = result.stderr.strip()
-
-    if "Not a valid JPG (looks more like a RIFF)" in err:
-        moved = move_to_riff(fpath)
-        return (fname, f"RIFF detected → moved to {moved}", "notmatch", (size_before, size_after))
-
-    moved = move_to_failed(fpath)
-    return (fname, f"Exiftool error: {err} → moved to {moved}", "notmatch", (size_before, size_after))
-
-
-# Main Function
-def main():
-    args = parse_args()
-    verbose = args.verbose
-
-    # Worker count
-    total_threads = os.cpu_count() or 1
-
-    if args.workers.lower() == "all":
-        workers = total_threads
-    else:
-        try:
-            pct = int(args.workers)
-            pct = max(1, min(pct, 100))
-            workers = max(1, math.floor(total_threads * (pct / 100)))
-        except ValueError:
-            workers = max(1, math.floor(total_threads * 0.8))
-
-    print(f"Using {workers} worker processes out of {total_threads} available threads.")
-
-    # Determine directories
-    if args.directory:
-        folder_list = [os.path.abspath(p.strip()) for p in args.directory.split(",") if p.strip()]
-        if verbose:
-            print(f"Using directories from --directory: {folder_list}")
-    else:
-        folder_list = [f.strip() for f in folders.split(",") if f.strip()]
-        if verbose:
-            print(f"Using default directories: {folder_list}")
-
-    all_files = []
-
-    # Scan directories
-    for folder in folder_list:
-        if os.path.isdir(folder):
-            for entry in os.listdir(folder):
-                fpath = os.path.join(folder, entry)
-                if os.path.isdir(fpath):
-                    with open(notmatch_log, "a", encoding="utf-8") as f_notmatch:
-                        f_notmatch.write(f"{entry} --> skipped directory\n")
-                    if verbose:
-                        print(f"Skipped directory: {entry}")
-                    summary["skipped"] += 1
-                else:
-                    all_files.append(fpath)
-
-    summary["total"] = len(all_files)
-
-    completed = 0
-    total = len(all_files)
-
-    with open(match_log, "w", encoding="utf-8") as f_match, \
-         open(notmatch_log, "w", encoding="utf-8") as f_notmatch, \
-         open(changed_log, "w", encoding="utf-8") as f_changed, \
-         ProcessPoolExecutor(max_workers=workers) as executor:
-
-        futures = {executor.submit(process_file, fpath): fpath for fpath in all_files}
-
-        for future in as_completed(futures):
-            fname, timestamp, status, sizes = future.result()
-            completed += 1
-
-            if verbose:
-                print(f"\n--- Checking file: {fname} ---")
-            else:
-                print_progress(completed, total)
-
-            if status == "match":
-                f_match.write(f"{fname} --> {timestamp}\n")
-                if verbose:
-                    print(f"Matched timestamp: {timestamp}")
-                summary["match"] += 1
-
-            elif status == "notmatch":
-                f_notmatch.write(f"{fname} --> {timestamp}\n")
-                if verbose:
-                    print(timestamp)
-                summary["notmatch"] += 1
-
-            elif status == "skip":
-                if verbose:
-                    print("Skipped (not a file).")
-                summary["skipped"] += 1
-
-            else:
-                f_notmatch.write(f"{fname} --> Unknown error\n")
-                if verbose:
-                    print("Other error, logged as not match.")
-                summary["notmatch"] += 1
-
-            if sizes:
-                size_before, size_after = sizes
-                if size_after > size_before:
-                    f_changed.write(f"{fname} --> size increased ({size_before} → {size_after} bytes)\n")
-                    if verbose:
-                        print(f"File size increased ({size_before} → {size_after} bytes).")
-                    summary["increased"] += 1
-                elif size_after < size_before:
-                    f_changed.write(f"{fname} --> size decreased ({size_before} → {size_after} bytes)\n")
-                    if verbose:
-                        print(f"File size decreased ({size_before} → {size_after} bytes).")
-                    summary["decreased"] += 1
-
-            if verbose:
-                print(f"[{completed}/{total}] Finished processing: {fname}")
-
-    if not verbose and total > 0:
-        print()
-
-    print("\n=== Summary ===")
-    print(f"Total files scanned: {summary['total']}")
-    print(f"Matched: {summary['match']}")
-    print(f"Not matched: {summary['notmatch']}")
-    print(f"Skipped: {summary['skipped']}")
-    print(f"Size increased: {summary['increased']}")
-    print(f"Size decreased: {summary['decreased']}")
-
-if __name__ == "__main__":
+import errno
+import os
+import re
+import shutil
+import subprocess
+import argparse
+import functools
+import math
+import json
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Default folders (can be overridden by --directory)
+folders = r"/data"
+
+cwd = os.getcwd()
+
+# LOG FILES
+match_log = os.path.join(cwd, "0Match.log")
+notmatch_log = os.path.join(cwd, "0NotMatch.log")
+changed_log = os.path.join(cwd, "0FileChanged.log")
+
+summary = {
+    "total": 0,
+    "match": 0,
+    "notmatch": 0,
+    "skipped": 0,
+    "increased": 0,
+    "decreased": 0
+}
+
+# Exiftool stay-open worker
+class ExiftoolWorker:
+    """One long-lived exiftool process in -stay_open batch mode (no fork per file)."""
+
+    def __init__(self, exiftool_path):
+        self.proc = subprocess.Popen(
+            [exiftool_path, "-stay_open", "True", "-@", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+            # close_fds=False lets CPython launch via posix_spawn
+            # instead of fork, skipping the page-table copy
+            close_fds=False
+        )
+
+    def execute(self, *args):
+        return self.execute_block("".join(arg + "\n" for arg in args))
+
+    def execute_block(self, cmd):
+        """Run a preformatted newline-separated argument block."""
+        cmd += "-execute\n"
+        self.proc.stdin.write(cmd.encode("utf-8"))
+        self.proc.stdin.flush()
+
+        output = b""
+        while True:
+            chunk = self.proc.stdout.read(4096)
+            if not chunk:
+                break
+            output += chunk
+            if output.rstrip().endswith(b"{ready}"):
+                break
+
+        return output.decode("utf-8", "replace").rsplit("{ready}", 1)[0]
+
+    def close(self):
+        try:
+            self.proc.stdin.write(b"-stay_open\nFalse\n")
+            self.proc.stdin.flush()
+            self.proc.wait(timeout=5)
+        except Exception:
+            self.proc.kill()
+
+# PATTERNS is the compiled pattern list resolved once in main(); the
+# parse threads read it as a plain module global, no pickling involved.
+# (The builtin default is assigned below, after builtin_patterns.)
+
+def set_patterns(patterns):
+    global PATTERNS, MATCHER_RE, MATCHER_DISPATCH, MATCH_ONE
+    PATTERNS = patterns
+    # Fusing is only safe when every group index is an int and the
+    # combined regex compiles: pattern.json entries with duplicate
+    # named groups or numeric backreferences break under the grpN
+    # wrappers' renumbering. Such configs fall back to the plain
+    # per-pattern loop the old code used (MATCHER_RE stays None).
+    MATCHER_RE = MATCHER_DISPATCH = None
+    if all(isinstance(pat["group"], int) for pat in patterns):
+        try:
+            MATCHER_RE, MATCHER_DISPATCH = build_matcher(patterns)
+        except re.error:
+            pass
+    if len(patterns) == 1 and len(patterns[0]["formats"]) == 1:
+        MATCH_ONE = _make_single_matcher(patterns[0])
+    else:
+        MATCH_ONE = None
+
+# Memoized regex compiler (shared across pattern.json reloads)
+@functools.lru_cache(maxsize=128)
+def _cre(pattern):
+    return re.compile(pattern)
+
+# Optional orjson: a much faster JSON decoder for pattern.json when it
+# is installed; the stdlib parser is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Parse + compile once per (path, mtime); repeat calls hit the cache
+@functools.lru_cache(maxsize=1)
+def _compile_patterns(json_path, mtime):
+    with open(json_path, "rb") as f:
+        raw = f.read()
+    data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+    patterns = []
+    for item in data.get("patterns", []):
+        patterns.append({
+            "regex": _cre(item["regex"]),
+            "group": item.get("group", 1),
+            "formats": item["formats"]
+        })
+
+    return patterns
+
+# Load external pattern.json
+def load_external_patterns():
+    json_path = os.path.join(cwd, "pattern.json")
+    try:
+        mtime = os.path.getmtime(json_path)
+    except OSError:
+        return None
+
+    try:
+        return _compile_patterns(json_path, mtime)
+    except Exception as e:
+        print(f"Error loading pattern.json: {e}")
+        return None
+
+# Built-in patterns (used only if pattern.json is missing); compiled
+# through _cre so pattern.json entries duplicating a builtin share the
+# same compiled object
+builtin_patterns = [
+    {
+        "regex": _cre(r'^(.*)=_=(\d{4}-\d{2}-\d{2}T\d{6}(?:\.\d{3})?Z).*'),
+        "group": 2,
+        "formats": ["%Y-%m-%dT%H%M%S.%fZ", "%Y-%m-%dT%H%M%SZ"]
+    },
+    {
+        "regex": _cre(r'^(.*)__(\d{4}-\d{2}-\d{2}T\d{6}(?:\.\d{3})?Z).*'),
+        "group": 2,
+        "formats": ["%Y-%m-%dT%H%M%S.%fZ", "%Y-%m-%dT%H%M%SZ"]
+    },
+    {
+        "regex": _cre(r'^(\d{4}-\d{2}-\d{2} \d{2}\.\d{2}\.\d{2}).*'),
+        "group": 1,
+        "formats": ["%Y-%m-%d %H.%M.%S"]
+    }
+]
+
+# Default for direct (non-pool) use; main() swaps in pattern.json
+PATTERNS = builtin_patterns
+
+# Fused matcher: all patterns joined into one alternation so the regex
+# engine tries every branch in a single call instead of a Python loop.
+def build_matcher(patterns):
+    """Return (regex, dispatch) for the fused pattern alternation.
+
+    dispatch maps each branch name to (absolute timestamp group index,
+    formats); the branch that matched comes back via m.lastgroup."""
+    parts = []
+    dispatch = {}
+    gindex = 0
+    for i, pat in enumerate(patterns):
+        name = f"grp{i}"
+        gindex += 1  # the (?P<grpN>...) wrapper itself
+        dispatch[name] = (gindex + pat["group"], pat["formats"])
+        parts.append(f"(?P<{name}>{pat['regex'].pattern})")
+        gindex += pat["regex"].groups
+    return _cre("|".join(parts)), dispatch
+
+MATCHER_RE, MATCHER_DISPATCH = build_matcher(builtin_patterns)
+
+# Fixed-width parsers for the known formats. strptime re-parses the
+# format string and routes through locale-aware code on every call, so
+# each parser slices digits out of the canonical shape directly — but
+# first checks length and separator positions, handing anything else
+# back to strptime so acceptance stays exactly what the format string
+# says (a lenient parser here would EXIF-write timestamps the
+# configured format rejects).
+def _parse_iso_frac(s):
+    # YYYY-MM-DDTHHMMSS.fZ .. .ffffffZ (%f takes 1-6 digits)
+    frac = s[18:-1]
+    if not (20 <= len(s) <= 25 and s[4] == "-" and s[7] == "-"
+            and s[10] == "T" and s[17] == "." and s[-1] == "Z"
+            and s[0:4].isdigit() and s[5:7].isdigit()
+            and s[8:10].isdigit() and s[11:17].isdigit()
+            and frac.isdigit()):
+        return datetime.strptime(s, "%Y-%m-%dT%H%M%S.%fZ")
+    return datetime(
+        int(s[0:4]), int(s[5:7]), int(s[8:10]),
+        int(s[11:13]), int(s[13:15]), int(s[15:17]),
+        int(frac) * 10 ** (6 - len(frac))
+    )
+
+def _parse_iso_plain(s):
+    # YYYY-MM-DDTHHMMSSZ
+    if not (len(s) == 18 and s[4] == "-" and s[7] == "-"
+            and s[10] == "T" and s[17] == "Z"
+            and s[0:4].isdigit() and s[5:7].isdigit()
+            and s[8:10].isdigit() and s[11:17].isdigit()):
+        return datetime.strptime(s, "%Y-%m-%dT%H%M%SZ")
+    return datetime(
+        int(s[0:4]), int(s[5:7]), int(s[8:10]),
+        int(s[11:13]), int(s[13:15]), int(s[15:17])
+    )
+
+def _parse_alt(s):
+    # YYYY-MM-DD HH.MM.SS
+    if not (len(s) == 19 and s[4] == "-" and s[7] == "-"
+            and s[10] == " " and s[13] == "." and s[16] == "."
+            and s[0:4].isdigit() and s[5:7].isdigit() and s[8:10].isdigit()
+            and s[11:13].isdigit() and s[14:16].isdigit() and s[17:19].isdigit()):
+        return datetime.strptime(s, "%Y-%m-%d %H.%M.%S")
+    return datetime(
+        int(s[0:4]), int(s[5:7]), int(s[8:10]),
+        int(s[11:13]), int(s[14:16]), int(s[17:19])
+    )
+
+# Formats without a fast parser (e.g. from pattern.json) still go
+# through strptime
+_FAST_PARSERS = {
+    "%Y-%m-%dT%H%M%S.%fZ": _parse_iso_frac,
+    "%Y-%m-%dT%H%M%SZ": _parse_iso_plain,
+    "%Y-%m-%d %H.%M.%S": _parse_alt,
+}
+
+# Specialized matcher for configurations with exactly one pattern and
+# one format: a closure with the regex, group and parser baked in skips
+# the alternation dispatch and the formats loop on every file. (A
+# closure gives the same effect as generating the function source at
+# runtime, without an exec step.)
+MATCH_ONE = None
+
+def _make_single_matcher(pat):
+    regex = pat["regex"]
+    group = pat["group"]
+    fmt = pat["formats"][0]
+    # The fast parsers are format-exact (shape mismatches go through
+    # strptime), so baking one in here can't accept timestamps the
+    # configured format forbids
+    parser = _FAST_PARSERS.get(fmt)
+
+    def match_one(fname):
+        m = regex.match(fname)
+        if not m:
+            return None, None
+        ts = m.group(group)
+        try:
+            dt = parser(ts) if parser else datetime.strptime(ts, fmt)
+        except ValueError:
+            return ts, None
+        return ts, dt
+
+    return match_one
+
+# Argument Parser
+def parse_args():
+    parser = argparse.ArgumentParser(description="Media Metadata Updater")
+
+    parser.add_argument(
+        "--workers",
+        default="80",
+        help="Percentage of CPU threads to use (e.g., 50, 80, 100) or 'all'"
+    )
+
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print detailed logs for each file instead of a progress bar"
+    )
+
+    parser.add_argument(
+        "--directory",
+        help="Comma-separated list of directories to scan (overrides default folders)"
+    )
+
+    parser.add_argument(
+        "--track-size",
+        action="store_true",
+        help="Log before/after file sizes (costs two extra stat syscalls per file)"
+    )
+
+    return parser.parse_args()
+
+# Progress Bar
+# All 41 bar states are precomputed and printing is throttled, so a
+# large run doesn't allocate two strings and flush the TTY per file
+_BARS = ["█" * i + "░" * (40 - i) for i in range(41)]
+_last_print = 0.0
+
+def print_progress(current, total):
+    global _last_print
+    if total == 0:
+        return
+    now = time.monotonic()
+    if current != total and now - _last_print < 0.1:
+        return
+    _last_print = now
+    percent = current / total
+    bar = _BARS[int(40 * percent)]
+    print(f"\rProcessing files: |{bar}| {current}/{total} ({percent*100:.1f}%)", end="", flush=True)
+
+# Move Helpers
+def _copy_file(src, target):
+    """Cross-device copy: in-kernel copy_file_range when available,
+    shutil.copy2 otherwise; metadata is preserved either way."""
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(target, "wb") as fdst:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30):
+                    pass
+            shutil.copystat(src, target)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, target)
+
+def _rename_or_copy(src, target):
+    """Same-filesystem moves are a metadata-only rename; only a
+    cross-device move (EXDEV) pays for a byte copy."""
+    try:
+        os.replace(src, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        _copy_file(src, target)
+        os.remove(src)
+
+# Move-target dirs are known up front; main() creates riff/failed once
+# and _made_dirs keeps every later call from re-stating the directory
+riff_dir = os.path.join(cwd, "riff")
+failed_dir = os.path.join(cwd, "failed")
+_made_dirs = set()
+
+def _ensure_dir(path):
+    if path not in _made_dirs:
+        os.makedirs(path, exist_ok=True)
+        _made_dirs.add(path)
+
+def safe_move(src, dst_dir):
+    _ensure_dir(dst_dir)
+    target = os.path.join(dst_dir, os.path.basename(src))
+    _rename_or_copy(src, target)
+    return target
+
+def move_to_riff(fpath):
+    return safe_move(fpath, riff_dir)
+
+def move_to_failed(fpath):
+    return safe_move(fpath, failed_dir)
+
+def move_to_manual(fpath):
+    folder = os.path.dirname(fpath)
+    manual_dir = os.path.join(folder, "manual")
+    _ensure_dir(manual_dir)
+
+    base = os.path.basename(fpath)
+    target = os.path.join(manual_dir, base)
+
+    if os.path.exists(target):
+        name, ext = os.path.splitext(base)
+        counter = 1
+        while True:
+            new_name = f"{name} ({counter}){ext}"
+            new_target = os.path.join(manual_dir, new_name)
+            if not os.path.exists(new_target):
+                target = new_target
+                break
+            counter += 1
+
+    _rename_or_copy(fpath, target)
+    return target
+
+# Parse File (pure CPU, runs in the pool; EXIF writes happen later)
+def _match_sequential(fname, start=0):
+    """Per-pattern loop: the whole path for unfusable pattern.json
+    configs, and the slow path when a fused branch matches but none of
+    its formats parse. Returns (timestamp_str, dt) or (None, None)."""
+    for pat in PATTERNS[start:]:
+        m = pat["regex"].match(fname)
+        if not m:
+            continue
+        ts = m.group(pat["group"])
+        for fmt in pat["formats"]:
+            parser = _FAST_PARSERS.get(fmt)
+            try:
+                dt = parser(ts) if parser else datetime.strptime(ts, fmt)
+            except ValueError:
+                continue
+            return ts, dt
+    return None, None
+
+def parse_file(item):
+    fpath, size_before = item
+    fname = os.path.basename(fpath)
+    if size_before is None:
+        return (fname, None, "error_size_before", None)
+
+    timestamp_str = None
+    dt = None
+
+    if MATCH_ONE is not None:
+        # Single-pattern configuration: use the specialized closure
+        timestamp_str, dt = MATCH_ONE(fname)
+    elif MATCHER_RE is None:
+        # set_patterns couldn't fuse this config; run every pattern
+        timestamp_str, dt = _match_sequential(fname)
+    else:
+        # One fused regex call covers every pattern; m.lastgroup names
+        # the branch that matched and dispatch gives group and formats
+        m = MATCHER_RE.match(fname)
+        if m:
+            gidx, formats = MATCHER_DISPATCH[m.lastgroup]
+            timestamp_str = m.group(gidx)
+            for fmt in formats:
+                parser = _FAST_PARSERS.get(fmt)
+                try:
+                    dt = parser(timestamp_str) if parser else datetime.strptime(timestamp_str, fmt)
+                    break
+                except ValueError:
+                    continue
+
+            if dt is None:
+                # The alternation commits to the first branch whose
+                # regex matches; when none of that pattern's formats
+                # parse, fall back to the plain per-pattern loop over
+                # the remaining patterns like the old code did
+                ts, dt = _match_sequential(fname, int(m.lastgroup[3:]) + 1)
+                if dt is not None:
+                    timestamp_str = ts
+
+    # If still no match, try the YYMMDD fallback prefix. Six leading
+    # digits plus a space/dash separator is all the old regexes ever
+    # checked, so cheap character tests replace the regex engine here.
+    if not dt:
+        if len(fname) >= 7 and fname[:6].isdigit() and (fname[6].isspace() or fname[6] == "-"):
+            yy, mm, dd = fname[0:2], fname[2:4], fname[4:6]
+            label = "Fallback2" if fname[6] == "-" else "Fallback1"
+            try:
+                dt = datetime(int("20" + yy), int(mm), int(dd))
+                timestamp_str = f"20{yy}-{mm}-{dd}"
+            except ValueError:
+                moved = move_to_failed(fpath)
+                return (fname, f"{label} YYMMDD parse error → moved to {moved}", "notmatch", (size_before, size_before))
+        else:
+            moved = move_to_failed(fpath)
+            return (fname, f"No pattern matched → moved to {moved}", "notmatch", (size_before, size_before))
+
+    # Hand the EXIF write off to the batched stay-open phase. The tag
+    # layout is fixed-width, so an f-string beats strftime's format
+    # parser for the same output
+    exif_timestamp = f"{dt.year:04d}:{dt.month:02d}:{dt.day:02d} {dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}"
+    return (fname, timestamp_str, "parsed", (fpath, exif_timestamp, size_before))
+
+def parse_files_chunk(items):
+    """Parse a whole slice of files in one executor dispatch."""
+    return [parse_file(i) for i in items]
+
+
+# Size tracking is off by default: exiftool with -overwrite_original
+# only rewrites EXIF bytes, so the before/after stats rarely pay off
+TRACK_SIZE = False
+
+exiftool_path = os.path.join(cwd, "exiftool")
+
+# Per-file write block; only the timestamp and path vary, so one
+# format call replaces five f-strings per file
+WRITE_CMD = (
+    "-overwrite_original\n"
+    "-DateTimeOriginal={ts}\n"
+    "-AllDates={ts}\n"
+    "-CreationTime={ts}\n"
+    "-ModifyDate={ts}\n"
+    "{path}\n"
+)
+
+# Batched EXIF writes: every matched file flows through one stay-open
+# exiftool process instead of one subprocess per file
+def write_exif_batch(entries):
+    if not entries:
+        return
+
+    worker = ExiftoolWorker(exiftool_path)
+    try:
+        for fname, timestamp_str, fpath, exif_timestamp, size_before in entries:
+            # Read the current tag first: on re-runs over an already-
+            # processed library this one-line reply replaces a rewrite
+            current = worker.execute("-DateTimeOriginal", "-s", "-s", "-s", fpath).strip()
+            if current == exif_timestamp:
+                yield (fname, timestamp_str, "match", (size_before, size_before))
+                continue
+
+            output = worker.execute_block(WRITE_CMD.format(ts=exif_timestamp, path=fpath))
+
+            # Only re-stat when exiftool actually rewrote the file
+            size_after = size_before
+
+            if "1 image files updated" in output:
+                if TRACK_SIZE:
+                    try:
+                        size_after = os.stat(fpath, follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+                yield (fname, timestamp_str, "match", (size_before, size_after))
+                continue
+
+            err = output.strip()
+
+            if "Not a valid JPG (looks more like a RIFF)" in err:
+                moved = move_to_riff(fpath)
+                yield (fname, f"RIFF detected → moved to {moved}", "notmatch", (size_before, size_after))
+            else:
+                moved = move_to_failed(fpath)
+                yield (fname, f"Exiftool error: {err} → moved to {moved}", "notmatch", (size_before, size_after))
+    finally:
+        worker.close()
+
+
+# Main Function
+def main():
+    global TRACK_SIZE
+
+    args = parse_args()
+    verbose = args.verbose
+    TRACK_SIZE = args.track_size
+
+    # Worker count
+    total_threads = os.cpu_count() or 1
+
+    if args.workers.lower() == "all":
+        workers = total_threads
+    else:
+        try:
+            pct = int(args.workers)
+            pct = max(1, min(pct, 100))
+            workers = max(1, math.floor(total_threads * (pct / 100)))
+        except ValueError:
+            workers = max(1, math.floor(total_threads * 0.8))
+
+    print(f"Using {workers} worker processes out of {total_threads} available threads.")
+
+    # Determine directories
+    if args.directory:
+        folder_list = [os.path.abspath(p.strip()) for p in args.directory.split(",") if p.strip()]
+        if verbose:
+            print(f"Using directories from --directory: {folder_list}")
+    else:
+        folder_list = [f.strip() for f in folders.split(",") if f.strip()]
+        if verbose:
+            print(f"Using default directories: {folder_list}")
+
+    all_files = []
+    skipped_dirs = []
+
+    # Per-run tallies land in a Counter and merge into summary once at
+    # the end, instead of five dict updates per file on the hot loops
+    counts = Counter()
+
+    # Scan directories. Skipped-directory names are collected here and
+    # handed to the logger thread — the old per-directory append was
+    # truncated away when the log was reopened in "w" mode below.
+    for folder in folder_list:
+        if os.path.isdir(folder):
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        skipped_dirs.append(entry.name)
+                        if verbose:
+                            print(f"Skipped directory: {entry.name}")
+                        counts["skipped"] += 1
+                    elif entry.is_file(follow_symlinks=False):
+                        # Grab the size here so workers don't re-stat
+                        # every file; without --track-size skip it
+                        if TRACK_SIZE:
+                            try:
+                                all_files.append((entry.path, entry.stat(follow_symlinks=False).st_size))
+                            except OSError:
+                                all_files.append((entry.path, None))
+                        else:
+                            all_files.append((entry.path, 0))
+                    else:
+                        if verbose:
+                            print(f"Skipped (not a file): {entry.name}")
+                        counts["skipped"] += 1
+
+    summary["total"] = len(all_files)
+
+    # Pre-create the shared move targets once up front
+    _ensure_dir(riff_dir)
+    _ensure_dir(failed_dir)
+
+    # Resolve patterns once: one json.load + one regex compile pass,
+    # visible to every parse thread through the module globals
+    set_patterns(load_external_patterns() or builtin_patterns)
+
+    completed = 0
+    total = len(all_files)
+
+    # A dedicated logger thread owns the three log files; the drain
+    # loop below just pushes tagged lines onto a queue, so result
+    # handling never stalls on disk I/O. The 1 MiB buffers mean the
+    # thread hits the disk in big batches rather than per line.
+    log_queue = queue.Queue()
+
+    def logger_main():
+        with open(match_log, "w", encoding="utf-8", buffering=1048576) as f_match, \
+             open(notmatch_log, "w", encoding="utf-8", buffering=1048576) as f_notmatch, \
+             open(changed_log, "w", encoding="utf-8", buffering=1048576) as f_changed:
+            files = {"match": f_match, "notmatch": f_notmatch, "changed": f_changed}
+            while True:
+                item = log_queue.get()
+                if item is None:
+                    break
+                which, line = item
+                files[which].write(line)
+
+    logger = threading.Thread(target=logger_main)
+    logger.start()
+
+    # The sentinel/join runs in a finally so a failure anywhere below
+    # (e.g. exiftool missing) still stops the non-daemon logger thread
+    # instead of hanging interpreter shutdown on it
+    try:
+        for name in skipped_dirs:
+            log_queue.put(("notmatch", f"{name} --> skipped directory\n"))
+
+        # Threads, not processes: after the exiftool batching the
+        # per-file work is just regex + datetime (C code that releases
+        # the GIL), so process-pool pickling would cost more than it buys
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+
+            def log_result(fname, timestamp, status, sizes):
+                nonlocal completed
+                completed += 1
+
+                if verbose:
+                    print(f"\n--- Checking file: {fname} ---")
+                else:
+                    print_progress(completed, total)
+
+                if status == "match":
+                    log_queue.put(("match", f"{fname} --> {timestamp}\n"))
+                    if verbose:
+                        print(f"Matched timestamp: {timestamp}")
+                    counts["match"] += 1
+
+                elif status == "notmatch":
+                    log_queue.put(("notmatch", f"{fname} --> {timestamp}\n"))
+                    if verbose:
+                        print(timestamp)
+                    counts["notmatch"] += 1
+
+                elif status == "skip":
+                    if verbose:
+                        print("Skipped (not a file).")
+                    counts["skipped"] += 1
+
+                else:
+                    log_queue.put(("notmatch", f"{fname} --> Unknown error\n"))
+                    if verbose:
+                        print("Other error, logged as not match.")
+                    counts["notmatch"] += 1
+
+                if sizes:
+                    size_before, size_after = sizes
+                    if size_after > size_before:
+                        log_queue.put(("changed", f"{fname} --> size increased ({size_before} → {size_after} bytes)\n"))
+                        if verbose:
+                            print(f"File size increased ({size_before} → {size_after} bytes).")
+                        counts["increased"] += 1
+                    elif size_after < size_before:
+                        log_queue.put(("changed", f"{fname} --> size decreased ({size_before} → {size_after} bytes)\n"))
+                        if verbose:
+                            print(f"File size decreased ({size_before} → {size_after} bytes).")
+                        counts["decreased"] += 1
+
+                if verbose:
+                    print(f"[{completed}/{total}] Finished processing: {fname}")
+
+            # Phase 1: parse filenames in parallel (no subprocess work).
+            # Chunked dispatch amortizes per-task executor overhead; ~8
+            # chunks per worker balances that against progress granularity,
+            # capped at 256 so huge runs still stream results back.
+            chunksize = max(1, min(256, math.ceil(total / (workers * 8)) if total else 1))
+            chunks = [all_files[i:i + chunksize] for i in range(0, total, chunksize)]
+            matched_entries = []
+
+            for chunk_results in executor.map(parse_files_chunk, chunks):
+                for fname, timestamp, status, payload in chunk_results:
+                    if status == "parsed":
+                        fpath, exif_timestamp, size_before = payload
+                        matched_entries.append((fname, timestamp, fpath, exif_timestamp, size_before))
+                    else:
+                        log_result(fname, timestamp, status, payload)
+
+            # Phase 2: one stay-open exiftool handles every matched file
+            for fname, timestamp, status, sizes in write_exif_batch(matched_entries):
+                log_result(fname, timestamp, status, sizes)
+
+    finally:
+        log_queue.put(None)
+        logger.join()
+
+    for key, val in counts.items():
+        summary[key] += val
+
+    if not verbose and total > 0:
+        print()
+
+    print("\n=== Summary ===")
+    print(f"Total files scanned: {summary['total']}")
+    print(f"Matched: {summary['match']}")
+    print(f"Not matched: {summary['notmatch']}")
+    print(f"Skipped: {summary['skipped']}")
+    print(f"Size increased: {summary['increased']}")
+    print(f"Size decreased: {summary['decreased']}")
+
+if __name__ == "__main__":
     main()
\ No newline at end of file